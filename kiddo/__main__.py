@@ -7,9 +7,50 @@ Todo:
 """
 
 # import modules.
+import codecs
+import collections
 import logging
-import platform
+import logging.handlers
+import os
+import queue
 import subprocess
+import sys
+import threading
+
+
+# valid lowercase logging levels for child process lines.
+_LEVELS = frozenset(("debug", "info", "warning", "error", "critical"))
+
+# length of the longest valid logging level; longer line prefixes can't be a level.
+_LEVEL_MAXLEN = max(len(level) for level in _LEVELS)
+
+# maximum number of stdout line batches (one per pipe read) waiting to be logged before the
+# reader blocks.
+_QUEUE_MAXSIZE = 64
+
+# number of bytes to request per read of a child process pipe.
+_READ_SIZE = 65536
+
+# subprocess.Popen() arguments that Kiddo.run() sets itself.
+# "startup_info" isn't a Popen() argument but has always been rejected, so it still is.
+_FORBIDDEN_KWARGS = frozenset(("args", "stdout", "stderr", "startupinfo", "startup_info", "text",
+    "universal_newlines", "encoding", "errors", "bufsize"))
+
+# if on Windows, create a template for hiding the console per: https://stackoverflow.com/a/1016651
+# see also: https://docs.python.org/3/library/subprocess.html#windows-popen-helpers
+_IS_WINDOWS = sys.platform == "win32"
+_WIN_STARTUPINFO = None
+if _IS_WINDOWS:
+    _WIN_STARTUPINFO = subprocess.STARTUPINFO()
+    _WIN_STARTUPINFO.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+# create the module's logger once; it's shared by all Kiddo instances.
+_MODULE_LOGGER = logging.getLogger(__name__)
+_MODULE_LOGGER.addHandler(logging.NullHandler())
+
+# child loggers by name, so each one is only fetched and given a handler once.
+_CHILD_LOGGERS = {}
+_CHILD_LOGGERS_LOCK = threading.Lock()
 
 
 def DEFAULT_LOG_INTERPRETER(line, **kwargs):
@@ -27,15 +68,56 @@ def DEFAULT_LOG_INTERPRETER(line, **kwargs):
     """
 
     # determine logging level based on the line prefix.
-    level = line[:line.find(":")].lower()
+    prefix, sep, message = line.partition(":")
+    if sep and len(prefix) <= _LEVEL_MAXLEN:
+        level = prefix.lower()
+        if level in _LEVELS:
+            return (level, message.strip())
+
+    # default to "info" if there's no valid logging level prefix.
+    return ("info", line)
+
+
+def _split_lines(text):
+    """ Splits @text on universal newlines, i.e. "\\r\\n", "\\r", and "\\n", like a text-mode pipe.
+    Unlike str.splitlines(), other line boundaries such as "\\x0c" are not split on.
+
+    Args:
+        - text (str): The text to split.
+
+    Returns:
+        list: The return value.
+        The lines of @text without their line endings. If @text ends with a line ending, the last
+        item is an empty string.
+    """
+
+    return text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
 
-    # default to None if @level is not a valid logging level.
-    if level not in ["debug", "info", "warning", "error", "critical"]:
-        level, message = "info", line
-    else:
-        message = line.split(":", 1)[1].strip()
+
+def _get_child_logger(name):
+    """ Gets the child logger called @name, creating it with a logging.NullHandler if this is the
+    first request for it.
+    
+    Args:
+        - name (str): The name of the logger.
     
-    return (level, message)
+    Returns:
+        logging.Logger: The return value.
+    """
+
+    # avoid the lock if the logger already exists.
+    child_logger = _CHILD_LOGGERS.get(name)
+    if child_logger is not None:
+        return child_logger
+
+    with _CHILD_LOGGERS_LOCK:
+        child_logger = _CHILD_LOGGERS.get(name)
+        if child_logger is None:
+            child_logger = logging.getLogger(name)
+            child_logger.addHandler(logging.NullHandler())
+            _CHILD_LOGGERS[name] = child_logger
+
+    return child_logger
 
 
 class Kiddo():
@@ -54,7 +136,7 @@ class Kiddo():
 
 
     def __init__(self, name, log_interpreter=None, hide_console=True, charset="utf-8", 
-        **kwargs):
+        stderr_maxlines=10000, **kwargs):
         """ Sets instance attributes. 
 
         Args:
@@ -66,8 +148,10 @@ class Kiddo():
             "error", "critical") and the message to log. If None, the default log interpreter is 
             used.
             - hide_console: Use True to prevent a new console from appearing (Windows).
-            - charset (str): The encoding with which to convert each line of 
-            @self.child_process.stdout.
+            - charset (str): The encoding with which to decode @self.child_process.stdout and
+            @self.child_process.stderr. Undecodable bytes are replaced.
+            - stderr_maxlines (int): The maximum number of @self.child_process.stderr lines that
+            @self.run() returns; only the most recent lines are kept. Use None for no limit.
 
         Attributes:
             - child_process (subprocess.Popen): The child process launched by @self.run(). This is
@@ -92,32 +176,50 @@ class Kiddo():
             DEFAULT_LOG_INTERPRETER)
         self.hide_console = hide_console
         self.charset = charset
+        self.stderr_maxlines = stderr_maxlines
         self.kwargs = kwargs
 
         # set other atributes.
         self.child_process = None
 
-        # create loggers.
-        self.logger = logging.getLogger(__name__)
-        self.logger.addHandler(logging.NullHandler())
-        self.child_logger = logging.getLogger(self.name)
-        self.child_logger.addHandler(logging.NullHandler())   
+        # set loggers.
+        self.logger = _MODULE_LOGGER
+        self.child_logger = _get_child_logger(self.name)
+
+        # map each valid logging level to its numeric level.
+        self._level_numbers = {level: getattr(logging, level.upper()) for level in _LEVELS}
 
  
-    def _log_child_process_line(self, line):
+    def _log_child_process_line(self, line, log_interpreter, interpreter_kwargs):
         """ Calls @self.child_logger to log a @line of text outputted by @self.child_process.stdout.
-        The @line is passed through @self.log_interpreter().
+        The @line is passed through @log_interpreter().
         
         Args:
             - line (str): The text outputted by the child process.
+            - log_interpreter (function): The log interpreter, i.e. @self.log_interpreter.
+            - interpreter_kwargs (dict): The keyword arguments for @log_interpreter, i.e.
+            @self.kwargs.
         
         Returns:
             None
         """
 
         try:
-            level, message = self.log_interpreter(line, **self.kwargs)
-            getattr(self.child_logger, level)(message, extra={"stdout":line})
+            if interpreter_kwargs:
+                level, message = log_interpreter(line, **interpreter_kwargs)
+            else:
+                level, message = log_interpreter(line)
+            numeric_level = self._level_numbers[level]
+            
+            # skip building the record if @self.child_logger would discard it.
+            if not self.child_logger.isEnabledFor(numeric_level):
+                return
+
+            # build the record directly rather than via an "extra" dict and a stack lookup.
+            record = self.child_logger.makeRecord(self.child_logger.name, numeric_level, __file__,
+                0, message, (), None)
+            record.stdout = line
+            self.child_logger.handle(record)
         except Exception as err:
             self.logger.warning("Can't log subprocess line: {}".format(line))
             self.logger.error(err)
@@ -125,74 +227,187 @@ class Kiddo():
         return
 
 
+    def _log_child_process_queue(self, line_queue):
+        """ Passes each stripped line of each batch in @line_queue to
+        @self._log_child_process_line() until a None sentinel is received. This is the target of
+        the logging thread started by @self.run().
+        
+        Args:
+            - line_queue (queue.Queue): Lists of stdout lines outputted by the child process.
+        
+        Returns:
+            None
+        """
+
+        # look these up once per run rather than once per line.
+        log_line = self._log_child_process_line
+        log_interpreter, interpreter_kwargs = self.log_interpreter, dict(self.kwargs)
+
+        for lines in iter(line_queue.get, None):
+            for line in lines:
+                log_line(line.strip(), log_interpreter, interpreter_kwargs)
+
+        return
+
+
+    def _iter_child_process_lines(self, pipe):
+        """ Yields the lines of @pipe, decoded with @self.charset, until the pipe closes. The pipe is
+        read in large chunks and each chunk is decoded and split in a single pass, so a chatty child
+        process costs one read, one decode, and one split per chunk rather than per line.
+        
+        Args:
+            - pipe (io.IOBase): A binary pipe of @self.child_process, e.g. its stdout.
+        
+        Yields:
+            list: The complete lines from the latest read, without their trailing newlines. As with
+            a text-mode pipe, "\\r\\n", "\\r", and "\\n" all end a line.
+        """
+
+        # decode before looking for line endings since, e.g. in UTF-16, a newline byte may just be
+        # part of another character. the decoder holds any partial character until the next read.
+        decoder = codecs.getincrementaldecoder(self.charset)(errors="replace")
+        fileno = pipe.fileno()
+        buf = ""
+        while True:
+            chunk = os.read(fileno, _READ_SIZE)
+            if not chunk:
+                break
+            buf += decoder.decode(chunk)
+
+            # keep any trailing partial line in @buf until the rest of it is read. a trailing "\r"
+            # might be the start of a "\r\n" split across reads, so its line is kept too.
+            end = max(buf.rfind("\n"), buf.rfind("\r"))
+            if end == len(buf) - 1 and buf[end] == "\r":
+                end = max(buf.rfind("\n", 0, end), buf.rfind("\r", 0, end))
+            if end != -1:
+                lines = _split_lines(buf[:end + 1])
+                buf = buf[end + 1:]
+                yield lines[:-1]
+
+        # yield the final line if it didn't end with a newline.
+        buf += decoder.decode(b"", final=True)
+        if buf:
+            lines = _split_lines(buf)
+            if not lines[-1]:
+                lines.pop()
+            yield lines
+
+        return
+
+
+    def _read_child_process_stderr(self, stderr_buf):
+        """ Appends each stripped line of @self.child_process.stderr to @stderr_buf until the pipe
+        closes. This is the target of the stderr thread started by @self.run().
+        
+        Args:
+            - stderr_buf (collections.deque): The container for the stderr lines.
+        
+        Returns:
+            None
+        """
+
+        for lines in self._iter_child_process_lines(self.child_process.stderr):
+            stderr_buf.extend(line.strip() for line in lines)
+
+        return
+
+
     def run(self, arg_list, **kwargs):
-        """ Runs @arg_list via subprocess.Popen() and sets that call as @self.child_process.
+        """ Runs @arg_list via subprocess.Popen() and sets that call as @self.child_process. Once
+        stdout is closed, each logging.handlers.MemoryHandler of @self.child_logger that has a target
+        is flushed so that it passes on every line before this returns. Other handlers aren't flushed.
 
         Args:
             - arg_list (list): When joined with a space, each item in this list forms the command to
             run. Example: "arg_list=['python3', '/myScripts/foo.py'])". If @arg_list is a string, it
             will be split before being passed to subprocess.Popen().
             - kwargs: Additional keyword values to pass along to subprocess.Popen() except for
-            forbidden arguments: "args", "stdout", "stderr", "startup_info", "text", 
-            "universal_newlines".
+            forbidden arguments: "args", "stdout", "stderr", "startupinfo", "startup_info", "text",
+            "universal_newlines", "encoding", "errors", "bufsize".
 
         Returns:
             tuple: The return value.
             The first item is the return code for @self.child_process. The second item is a list of
-            each line from @self.child_process.stderr.
+            each line from @self.child_process.stderr, up to the last @self.stderr_maxlines lines.
 
         Raises:
-            - ValueError: If **kwargs contains a forbidden argument.
+            - ValueError: If **kwargs contains any forbidden arguments.
         """
         
+        # only format debug messages if they'll actually be logged.
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+
         # if needed, split @arg_list.
         if isinstance(arg_list, str):
             arg_list = arg_list.split()
-            self.logger.debug("Split @arg_list string to a list: {}".format(arg_list))
+            if debug:
+                self.logger.debug("Split @arg_list string to a list: {}".format(arg_list))
             
         # make sure forbidden args are not in @kwargs.
-        for forbidden in ["args", "stdout", "stderr", "startup_info", "text", "universal_newlines"]:
-            if forbidden in kwargs:
-                msg = "@kwargs contaings forbidden argument: {}".format(forbidden)
-                self.logger.error(msg)
-                raise ValueError(msg)
+        forbidden = _FORBIDDEN_KWARGS.intersection(kwargs)
+        if forbidden:
+            msg = "@kwargs contains forbidden arguments: {}".format(sorted(forbidden))
+            self.logger.error(msg)
+            raise ValueError(msg)
         
         # create the command to run.
-        self.logger.debug("Running command: {}".format(" ".join(arg_list)))
+        if debug:
+            self.logger.debug("Running command: {}".format(" ".join(arg_list)))
     
-        # if needed, hide the Windows console per: https://stackoverflow.com/a/1016651
-        # see also: https://docs.python.org/3/library/subprocess.html#windows-popen-helpers
+        # if needed, hide the Windows console.
         startup_info = None
-        if (self.hide_console and platform.system() == "Windows"):
-            startup_info = subprocess.STARTUPINFO()
-            startup_info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        if (self.hide_console and _IS_WINDOWS):
+            startup_info = _WIN_STARTUPINFO.copy()
 
         # run child process based on: https://stackoverflow.com/a/803396.
+        # the pipes are unbuffered bytes since @self._iter_child_process_lines() reads and decodes.
         try:
             self.child_process = subprocess.Popen(args=arg_list, stdout=subprocess.PIPE, 
-            stderr=subprocess.PIPE, startupinfo=startup_info, universal_newlines=True, **kwargs)
+            stderr=subprocess.PIPE, startupinfo=startup_info, bufsize=0, **kwargs)
         except Exception as err:
             self.logger.warning("Couldn't run command.")
             self.logger.error(err)
             raise
         
-        # log each line of stdout.
-        while self.child_process.poll() is None:
-        
-            for line in self.child_process.stdout:
-                line = line.encode().decode(self.charset, errors="ignore")
-                line = line.strip()
-                self._log_child_process_line(line)
+        # drain stderr alongside stdout so the child can't block on a full stderr pipe.
+        stderr_buf = collections.deque(maxlen=self.stderr_maxlines)
+        stderr_thread = threading.Thread(target=self._read_child_process_stderr, 
+            args=(stderr_buf,), daemon=True)
+        stderr_thread.start()
+
+        # log stdout from a separate thread so slow log handlers don't stall the child process.
+        line_queue = queue.Queue(maxsize=_QUEUE_MAXSIZE)
+        log_thread = threading.Thread(target=self._log_child_process_queue, args=(line_queue,),
+            daemon=True)
+        log_thread.start()
+
+        # queue each batch of stdout lines; block on each read until the pipe closes.
+        try:
+            for lines in self._iter_child_process_lines(self.child_process.stdout):
+                line_queue.put(lines)
+        finally:
+            line_queue.put(None)
+            log_thread.join()
+
+            # deliver any lines held by memory handlers. other handlers aren't flushed since, e.g.,
+            # logging.handlers.BufferingHandler.flush() discards its records.
+            for handler in self.child_logger.handlers:
+                if isinstance(handler, logging.handlers.MemoryHandler) and handler.target:
+                    handler.flush()
+        stderr_thread.join()
+        self.child_process.wait()
 
         # create items for return tuple.
         retcode = self.child_process.returncode
-        reterr = [l.strip() for l in self.child_process.stderr.readlines()]
+        reterr = list(stderr_buf)
         
         # report on results.
         if retcode != 0 or len(reterr) != 0:
             self.logger.warning("Running the command appears to have failed.")
-            self.logger.debug("@self.child_process.stderr: {}".format(reterr))
-        self.logger.debug("Command returned code: {}".format(retcode))
+            if debug:
+                self.logger.debug("@self.child_process.stderr: {}".format(reterr))
+        if debug:
+            self.logger.debug("Command returned code: {}".format(retcode))
 
         return (retcode, reterr)
 
@@ -15,7 +15,7 @@ setup(
     version = __VERSION__,
     packages = setuptools.find_packages(),
     include_package_data = True,
-    python_requires = ">=3.5",
+    python_requires = ">=3.7",
     license = "LICENSE.txt",
     long_description = read_doc(),
 )
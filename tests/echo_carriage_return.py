@@ -0,0 +1,9 @@
+#!/usr/bin/python 3
+
+import sys
+
+# output lines separated by "\r", "\r\n", and "\n", e.g. like a progress bar.
+sys.stdout.write("debug: 0\rinfo: 1\r\nwarning: 2\rerror: 3\n4")
+sys.stdout.flush()
+
+sys.exit()
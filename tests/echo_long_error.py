@@ -0,0 +1,10 @@
+#!/usr/bin/python 3
+
+import sys
+
+max = int(sys.argv[-1])
+for i in range(max):
+    sys.stderr.write("error: {}\n".format(i))
+    sys.stdout.write("info: {}\n".format(i))
+
+sys.exit()
\ No newline at end of file
@@ -0,0 +1,9 @@
+#!/usr/bin/python 3
+
+import sys
+
+# output UTF-16 text whose "Ċ" character contains the same byte as a newline.
+sys.stdout.buffer.write("info: Ċ\nnext\n".encode("utf-16-le"))
+sys.stdout.flush()
+
+sys.exit()
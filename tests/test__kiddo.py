@@ -4,7 +4,6 @@ import sys; sys.path.append("..")
 import logging
 import logging.handlers
 import os
-import platform
 import random
 import unittest
 import kiddo
@@ -71,7 +70,7 @@ class Test_Kiddo(unittest.TestCase):
 
         # run app.
         app_file = os.path.join(os.path.dirname(__file__), "echo_max_line.py")
-        py_prefix = "py -3" if platform.system() == "Windows" else "python3"
+        py_prefix = "py -3" if sys.platform == "win32" else "python3"
         cmd = "{} {} {}".format(py_prefix, app_file, final_line)
         logging.info("Running: {}".format(cmd))
         kid.run(cmd)
@@ -84,6 +83,55 @@ class Test_Kiddo(unittest.TestCase):
         self.assertEqual(log_val, final_line)
 
 
+    def test__carriage_return_output(self):
+        """ Tests that "\\r" and "\\r\\n" end stdout lines, like "\\n" does. """
+
+        # creat Kiddo instance and add memory logger for its child process.
+        kid = kiddo.Kiddo(name=sys._getframe().f_code.co_name)
+        mem_logger = logging.handlers.MemoryHandler(1000)
+        kid.child_logger.level = logging.DEBUG
+        kid.child_logger.addHandler(mem_logger)
+
+        # run app.
+        app_file = os.path.join(os.path.dirname(__file__), "echo_carriage_return.py")
+        py_prefix = "py -3" if sys.platform == "win32" else "python3"
+        cmd = "{} {}".format(py_prefix, app_file)
+        logging.info("Running: {}".format(cmd))
+        kid.run(cmd)
+
+        # get the message and level of each record in @mem_logger.
+        records = [(record.msg, record.levelname) for record in mem_logger.buffer]
+        logging.info("Logged records: {}".format(records))
+
+        logging.info("Making sure each line was logged separately with its level.")
+        self.assertEqual(records, [("0", "DEBUG"), ("1", "INFO"), ("2", "WARNING"), 
+            ("3", "ERROR"), ("4", "INFO")])
+
+
+    def test__charset_output(self):
+        """ Tests that stdout is split into lines after it's decoded with the charset. """
+
+        # creat Kiddo instance and add memory logger for its child process.
+        kid = kiddo.Kiddo(name=sys._getframe().f_code.co_name, charset="utf-16-le")
+        mem_logger = logging.handlers.MemoryHandler(1000)
+        kid.child_logger.level = logging.DEBUG
+        kid.child_logger.addHandler(mem_logger)
+
+        # run app.
+        app_file = os.path.join(os.path.dirname(__file__), "echo_utf16.py")
+        py_prefix = "py -3" if sys.platform == "win32" else "python3"
+        cmd = "{} {}".format(py_prefix, app_file)
+        logging.info("Running: {}".format(cmd))
+        kid.run(cmd)
+
+        # get the message of each record in @mem_logger.
+        messages = [record.msg for record in mem_logger.buffer]
+        logging.info("Logged messages: {}".format(messages))
+
+        logging.info("Making sure each line was decoded and logged whole.")
+        self.assertEqual(messages, ["\u010a", "next"])
+
+
     def test__error(self):
         """ Tests that errors are captured. """
 
@@ -92,7 +140,7 @@ class Test_Kiddo(unittest.TestCase):
 
         # run app.
         app_file = os.path.join(os.path.dirname(__file__), "echo_error_code.py")
-        py_prefix = "py -3" if platform.system() == "Windows" else "python3"
+        py_prefix = "py -3" if sys.platform == "win32" else "python3"
         cmd = "{} {}".format(py_prefix, app_file)
         logging.info("Running: {}".format(cmd))
         
@@ -106,5 +154,98 @@ class Test_Kiddo(unittest.TestCase):
         self.assertTrue(result_bool)
 
 
+    def test__long_error(self):
+        """ Tests that stderr larger than the pipe buffer doesn't block the child process. """
+
+        # creat Kiddo instance.
+        kid = kiddo.Kiddo(name=sys._getframe().f_code.co_name, stderr_maxlines=None)
+
+        # run app.
+        max_lines = 20000
+        app_file = os.path.join(os.path.dirname(__file__), "echo_long_error.py")
+        py_prefix = "py -3" if sys.platform == "win32" else "python3"
+        cmd = "{} {} {}".format(py_prefix, app_file, max_lines)
+        logging.info("Running: {}".format(cmd))
+        
+        # get return code, stderr.
+        ret_code, ret_err = kid.run(cmd)
+        logging.info("Return code: {}".format(ret_code))
+        logging.info("STDERR line count: {}".format(len(ret_err)))
+
+        logging.info("Making sure return code is 0 and that all STDERR lines were captured.")
+        self.assertEqual(ret_code, 0)
+        self.assertEqual(ret_err[-1], "error: {}".format(max_lines - 1))
+        self.assertEqual(len(ret_err), max_lines)
+
+
+    def test__stderr_maxlines(self):
+        """ Tests that only the most recent stderr lines are returned. """
+
+        # creat Kiddo instance.
+        max_stderr = 100
+        kid = kiddo.Kiddo(name=sys._getframe().f_code.co_name, stderr_maxlines=max_stderr)
+
+        # run app.
+        max_lines = 1000
+        app_file = os.path.join(os.path.dirname(__file__), "echo_long_error.py")
+        py_prefix = "py -3" if sys.platform == "win32" else "python3"
+        cmd = "{} {} {}".format(py_prefix, app_file, max_lines)
+        logging.info("Running: {}".format(cmd))
+        
+        # get stderr.
+        ret_code, ret_err = kid.run(cmd)
+        logging.info("STDERR line count: {}".format(len(ret_err)))
+
+        logging.info("Making sure only the last {} STDERR lines were returned.".format(max_stderr))
+        self.assertEqual(ret_err[0], "error: {}".format(max_lines - max_stderr))
+        self.assertEqual(len(ret_err), max_stderr)
+
+
+    def test__buffered_output(self):
+        """ Tests that lines held by a buffering handler are flushed when the run ends. """
+
+        # creat Kiddo instance and add a buffering logger for its child process.
+        kid = kiddo.Kiddo(name=sys._getframe().f_code.co_name)
+        target = logging.handlers.BufferingHandler(10000)
+        mem_logger = logging.handlers.MemoryHandler(1000, flushLevel=logging.CRITICAL, 
+            target=target)
+        kid.child_logger.level = logging.DEBUG
+        kid.child_logger.addHandler(mem_logger)
+
+        # run app; it outputs fewer lines than @mem_logger holds.
+        final_line = 100
+        app_file = os.path.join(os.path.dirname(__file__), "echo_max_line.py")
+        py_prefix = "py -3" if sys.platform == "win32" else "python3"
+        cmd = "{} {} {}".format(py_prefix, app_file, final_line)
+        logging.info("Running: {}".format(cmd))
+        kid.run(cmd)
+
+        logging.info("Making sure all lines reached the target handler.")
+        self.assertEqual(len(target.buffer), final_line + 1)
+        self.assertEqual(int(target.buffer[-1].msg), final_line)
+
+
+
+    def test__buffering_handler(self):
+        """ Tests that a plain buffering handler still holds its lines when the run ends. """
+
+        # creat Kiddo instance and add a buffering logger with no target for its child process.
+        kid = kiddo.Kiddo(name=sys._getframe().f_code.co_name)
+        buf_logger = logging.handlers.BufferingHandler(10000)
+        kid.child_logger.level = logging.DEBUG
+        kid.child_logger.addHandler(buf_logger)
+
+        # run app.
+        final_line = 100
+        app_file = os.path.join(os.path.dirname(__file__), "echo_max_line.py")
+        py_prefix = "py -3" if sys.platform == "win32" else "python3"
+        cmd = "{} {} {}".format(py_prefix, app_file, final_line)
+        logging.info("Running: {}".format(cmd))
+        kid.run(cmd)
+
+        logging.info("Making sure all lines are still in the buffering handler.")
+        self.assertEqual(len(buf_logger.buffer), final_line + 1)
+        self.assertEqual(int(buf_logger.buffer[-1].msg), final_line)
+
 if __name__ == "__main__":
     pass
\ No newline at end of file